@@ -1,9 +1,11 @@
 version = {
     "major": 1,
-    "minor": 0,
+    "minor": 1,
     "type": 0,
 }
 
+import struct
+
 import bpy
 from bpy.props import (
     StringProperty,
@@ -20,120 +22,643 @@ from bpy.types import (
     Operator,
 )
 
+# Precompiled packers for the binary format
+_PACK_HDR_VERSION = struct.Struct("<BBB")
+_PACK_U32 = struct.Struct("<I")
+_PACK_U16 = struct.Struct("<H")
+_PACK_LOOP = struct.Struct("<3f3f2f3f")
+_PACK_LOOP_HALF = struct.Struct("<3e3e2e3e")
+_PACK_LOOP_QUANTIZED = struct.Struct("<3H3b2H3b")
+_PACK_QUANTIZATION = struct.Struct("<3f3f2f2f")
+
+# Packed data beyond this size is spooled to disk until the header is written
+SPOOL_MAX_SIZE = 64 << 20
+COPY_CHUNK_SIZE = 1 << 20
+
+# Largest finite float16 value
+HALF_MAX = 65504.0
+
+_VERTEX_PACKERS = {
+    "FULL": _PACK_LOOP,
+    "HALF": _PACK_LOOP_HALF,
+    "QUANTIZED": _PACK_LOOP_QUANTIZED,
+}
+
+# <options> flags
+OPTION_INDEXED = 1 << 0
+OPTION_HALF = 1 << 1
+OPTION_QUANTIZED = 1 << 2
+
+PRECISION_OPTIONS = {
+    "FULL": 0,
+    "HALF": OPTION_HALF,
+    "QUANTIZED": OPTION_QUANTIZED,
+}
 
-def write_header(self, buffer, objects, use_mesh_modifiers=False):
-    import struct
 
+def write_header(self, buffer, num_objects, options=0):
     print("Writing header")
     buffer.write(
-        struct.pack("<BBB", version["major"], version["minor"], version["type"])
+        _PACK_HDR_VERSION.pack(version["major"], version["minor"], version["type"])
     )                                                                                   # <version>
-    # No options defined in this version of the spec
-    buffer.write(struct.pack("<I", 0))                                                  # <options>
-    num_objects = sum(1 for obj in objects if obj.type == "MESH")
-    buffer.write(struct.pack("<I", num_objects))                                        ## <num-objects>
-    for obj in objects:
-        if obj.mode == "EDIT":
-            obj.update_from_editmode()
+    buffer.write(_PACK_U32.pack(options))                                               # <options>
+    buffer.write(_PACK_U32.pack(num_objects))                                           ## <num-objects>
+
+
+def gather_triangle_arrays(mesh, uv_layer):
+    import numpy as np
+
+    # Gather mesh data in bulk
+    num_vertices = len(mesh.vertices)
+    vertex_co = np.empty(num_vertices * 3, dtype="<f4")
+    mesh.vertices.foreach_get("co", vertex_co)
+    vertex_normal = np.empty(num_vertices * 3, dtype="<f4")
+    mesh.vertices.foreach_get("normal", vertex_normal)
+
+    num_loops = len(mesh.loops)
+    loop_vertex_index = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertex_index)
+    if uv_layer is not None:
+        loop_uv = np.empty(num_loops * 2, dtype="<f4")
+        uv_layer.data.foreach_get("uv", loop_uv)
+        loop_tangent = np.empty(num_loops * 3, dtype="<f4")
+        mesh.loops.foreach_get("tangent", loop_tangent)
+    else:
+        loop_uv = np.zeros(num_loops * 2, dtype="<f4")
+        loop_tangent = np.zeros(num_loops * 3, dtype="<f4")
+
+    num_tris = len(mesh.loop_triangles)
+    tri_loops = np.empty(num_tris * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", tri_loops)
+
+    return {
+        "vertex_co": vertex_co.reshape(-1, 3),
+        "vertex_normal": vertex_normal.reshape(-1, 3),
+        "loop_vertex_index": loop_vertex_index,
+        "loop_uv": loop_uv.reshape(-1, 2),
+        "loop_tangent": loop_tangent.reshape(-1, 3),
+        "tri_loops": tri_loops.reshape(-1, 3),
+    }
+
+
+def exceeds_half_range(obj, matrix):
+    from mathutils import Vector
+
+    corners = (matrix @ Vector(corner) for corner in obj.bound_box)
+    return any(abs(value) > HALF_MAX for corner in corners for value in corner)
+
+
+def has_ngons(mesh):
+    try:
+        import numpy as np
+    except ImportError:
+        return any(polygon.loop_total > 4 for polygon in mesh.polygons)
+
+    loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    return bool((loop_totals > 4).any())
+
+
+def triangulate(mesh):
+    import bmesh
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.triangulate(bm, faces=bm.faces)
+    bm.to_mesh(mesh)
+    bm.free()
+
+
+def normal_matrix(mat3):
+    import numpy as np
+
+    # The cofactor matrix is the inverse transpose scaled by the determinant,
+    # but stays defined for singular transforms such as a zero scale axis
+    columns = mat3.T
+    cofactor = np.stack(
+        (
+            np.cross(columns[1], columns[2]),
+            np.cross(columns[2], columns[0]),
+            np.cross(columns[0], columns[1]),
+        ),
+        axis=1,
+    )
+    if np.linalg.det(mat3) < 0:
+        cofactor = -cofactor
+    return cofactor
+
+
+def normalize_rows(vectors):
+    import numpy as np
+
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, lengths, out=vectors, where=lengths > 0)
+    return vectors
+
+
+def quantization_range(values):
+    import numpy as np
+
+    if len(values) == 0:
+        return np.zeros(values.shape[1], "<f4"), np.ones(values.shape[1], "<f4")
+    minimum = values.min(axis=0)
+    scale = values.max(axis=0) - minimum
+    scale[scale == 0] = 1
+    return minimum, scale
+
+
+def index_vertices(corners):
+    import numpy as np
+
+    # Deduplicate corners by their raw bytes
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize)))
+    _, first_corners, indices = np.unique(
+        keys, return_index=True, return_inverse=True
+    )
+
+    # np.unique sorts by value, renumber the vertices by first occurrence to
+    # keep their spatial order
+    order = np.argsort(first_corners)
+    renumber = np.empty_like(order)
+    renumber[order] = np.arange(len(order))
+    indices = renumber[indices.ravel()]
+
+    num_vertices = len(order)
+    index_dtype = "<u2" if num_vertices <= 2**16 else "<u4"
+    return b"".join(
+        (
+            _PACK_U32.pack(num_vertices),                                               # <vertex-count>
+            corners[first_corners[order]].tobytes(),                                    # {<vertex>}
+            indices.astype(index_dtype).tobytes(),                                      # {<index>}
+        )
+    )
+
+
+def pack_triangles(arrays, matrix, use_indexed=False, precision="FULL"):
+    import numpy as np
+
+    # On-disk <vertex> layout, packed without padding
+    position_type, normal_type, uv_type, tangent_type = {
+        "FULL": ("<f4", "<f4", "<f4", "<f4"),
+        "HALF": ("<f2", "<f2", "<f2", "<f2"),
+        "QUANTIZED": ("<u2", "i1", "<u2", "i1"),
+    }[precision]
+    vertex_dtype = np.dtype(
+        [
+            ("position", position_type, 3),                                             # <position>
+            ("normal", normal_type, 3),                                                 # <normal>
+            ("uv", uv_type, 2),                                                         # <uv>
+            ("tangent", tangent_type, 3),                                               # <tangent>
+        ]
+    )
+
+    # Apply the export transform; normals need the inverse transpose
+    mat3 = np.array(matrix.to_3x3(), dtype=np.float32)
+    translation = np.array(matrix.translation, dtype=np.float32)
+    normal_mat3 = normal_matrix(mat3)
+    vertex_co = arrays["vertex_co"] @ mat3.T + translation
+    vertex_normal = normalize_rows(arrays["vertex_normal"] @ normal_mat3.T)
+    loop_tangent = normalize_rows(arrays["loop_tangent"] @ mat3.T)
+
+    # Triangle corners are written in reverse loop order, unless the
+    # transform mirrors the mesh, which already reverses the winding
+    tri_loops = arrays["tri_loops"]
+    if not matrix.is_negative:
+        tri_loops = tri_loops[:, ::-1]
+    corner_loops = tri_loops.ravel()
+    corner_vertices = arrays["loop_vertex_index"][corner_loops]
+
+    positions = vertex_co[corner_vertices]
+    normals = vertex_normal[corner_vertices]
+    uvs = arrays["loop_uv"][corner_loops]
+    tangents = loop_tangent[corner_loops]
+
+    quantization = b""
+    if precision == "HALF":
+        # Out of range values would become infinite, clamp them like the
+        # struct fallback does
+        positions, normals, uvs, tangents = (
+            np.clip(values, -HALF_MAX, HALF_MAX)
+            for values in (positions, normals, uvs, tangents)
+        )
+    elif precision == "QUANTIZED":
+        # Positions and UVs are stored relative to their bounds,
+        # normals and tangents are unit vectors. Quantize in double precision
+        # so the result matches the struct fallback
+        positions, normals, uvs, tangents = (
+            values.astype(np.float64) for values in (positions, normals, uvs, tangents)
+        )
+        position_min, position_scale = quantization_range(positions)
+        uv_min, uv_scale = quantization_range(uvs)
+        quantization = np.concatenate(
+            (position_min, position_scale, uv_min, uv_scale)
+        ).astype("<f4").tobytes()
+        positions = np.rint((positions - position_min) / position_scale * 65535)
+        normals = np.rint(normals * 127)
+        uvs = np.rint((uvs - uv_min) / uv_scale * 65535)
+        tangents = np.rint(tangents * 127)
+
+    corners = np.empty(len(corner_loops), dtype=vertex_dtype)
+    corners["position"] = positions
+    corners["normal"] = normals
+    corners["uv"] = uvs
+    corners["tangent"] = tangents
+    if use_indexed:
+        return quantization + index_vertices(corners)
+    return quantization + corners.tobytes()
+
+
+def quantization_range_struct(values, num_components):
+    if not values:
+        return (0.0,) * num_components, (1.0,) * num_components
+    minimum = tuple(map(min, zip(*values)))
+    maximum = tuple(map(max, zip(*values)))
+    scale = tuple((high - low) or 1.0 for low, high in zip(minimum, maximum))
+    return minimum, scale
+
+
+def convert_precision_struct(buf, precision):
+    # Repack full precision corners, returns the quantization data and corners
+    if precision == "FULL":
+        return b"", buf
+
+    corners = list(_PACK_LOOP.iter_unpack(buf))
+    if precision == "HALF":
+        # Out of range values would overflow, clamp them to the largest half
+        pack = _PACK_LOOP_HALF.pack
+        return b"", b"".join(
+            pack(*(min(max(value, -HALF_MAX), HALF_MAX) for value in corner))
+            for corner in corners
+        )
+
+    # Positions and UVs are stored relative to their bounds,
+    # normals and tangents are unit vectors
+    position_min, position_scale = quantization_range_struct(
+        [corner[0:3] for corner in corners], 3
+    )
+    uv_min, uv_scale = quantization_range_struct(
+        [corner[6:8] for corner in corners], 2
+    )
+    quantization = _PACK_QUANTIZATION.pack(
+        *position_min, *position_scale, *uv_min, *uv_scale
+    )
+
+    def quantize(value, minimum, scale):
+        return round((value - minimum) / scale * 65535)
+
+    pack = _PACK_LOOP_QUANTIZED.pack
+    quantized = []
+    for corner in corners:
+        quantized.append(
+            pack(
+                *map(quantize, corner[0:3], position_min, position_scale),
+                *(round(value * 127) for value in corner[3:6]),
+                *map(quantize, corner[6:8], uv_min, uv_scale),
+                *(round(value * 127) for value in corner[8:11]),
+            )
+        )
+    return quantization, b"".join(quantized)
+
+
+def index_vertices_struct(buf, size):
+    vertex_indices = {}
+    indices = []
+    for offset in range(0, len(buf), size):
+        vertex = bytes(buf[offset : offset + size])
+        indices.append(vertex_indices.setdefault(vertex, len(vertex_indices)))
+    num_vertices = len(vertex_indices)
+    index_format = "H" if num_vertices <= 2**16 else "I"
+    return b"".join(
+        (
+            _PACK_U32.pack(num_vertices),                                               # <vertex-count>
+            b"".join(vertex_indices),                                                   # {<vertex>}
+            struct.pack(f"<{len(indices)}{index_format}", *indices),                    # {<index>}
+        )
+    )
+
+
+def make_loop_packer(use_uv):
+    # Generate a packer with the three corners of each triangle unrolled and
+    # the UV lookups specialized away, which keeps the fallback loop tight
+    size = _PACK_LOOP.size
+    lines = [
+        "def pack_loops(buf, loop_triangles, loops, vertices, uv_data):",
+        "    offset = 0",
+        "    for triangle in loop_triangles:",
+        "        loop_indices = triangle.loops",
+    ]
+    # Triangle corners are written in reverse loop order
+    for corner, loop in enumerate((2, 1, 0)):
+        lines += [
+            f"        loop_index = loop_indices[{loop}]",
+            "        loop = loops[loop_index]",
+            "        vertex = vertices[loop.vertex_index]",
+            "        co = vertex.co",
+            "        normal = vertex.normal",
+        ]
+        if use_uv:
+            lines += [
+                "        uv = uv_data[loop_index].uv",
+                "        tangent = loop.tangent",
+            ]
+            uv_args = "uv[0], uv[1]"
+            tangent_args = "tangent[0], tangent[1], tangent[2]"
+        else:
+            uv_args = "0.0, 0.0"
+            tangent_args = "0.0, 0.0, 0.0"
+        lines.append(
+            f"        pack_into(buf, offset + {corner * size}, "
+            "co[0], co[1], co[2], "
+            "normal[0], normal[1], normal[2], "
+            f"{uv_args}, {tangent_args})"
+        )
+    lines.append(f"        offset += {3 * size}")
+
+    namespace = {"pack_into": _PACK_LOOP.pack_into}
+    exec("\n".join(lines), namespace)
+    return namespace["pack_loops"]
+
+
+_LOOP_PACKERS = {
+    True: make_loop_packer(True),
+    False: make_loop_packer(False),
+}
+
+
+def pack_triangles_struct(mesh, uv_layer, use_indexed=False, precision="FULL"):
+    # Fallback for when NumPy is unavailable
+    buf = bytearray(len(mesh.loop_triangles) * 3 * _PACK_LOOP.size)
+    uv_data = uv_layer.data if uv_layer is not None else None
+    pack_loops = _LOOP_PACKERS[uv_data is not None]
+    pack_loops(buf, mesh.loop_triangles, mesh.loops, mesh.vertices, uv_data)
+
+    quantization, buf = convert_precision_struct(buf, precision)
+    if use_indexed:
+        vertex_size = _VERTEX_PACKERS[precision].size
+        return quantization + index_vertices_struct(buf, vertex_size)
+    return quantization + buf
+
+
+def write_objects(
+    self,
+    executor,
+    metadata_buffer,
+    data_buffer,
+    objects,
+    global_matrix,
+    depsgraph=None,
+    use_indexed=False,
+    precision="FULL",
+):
+    import os
+    from collections import deque
+    from concurrent.futures import Future
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    # Packed blocks are written out in order as soon as they are done, and
+    # only a few are kept in flight, so the data never sits fully in memory
+    packed_objects = deque()
+    max_packed_objects = 2 * (os.cpu_count() or 1)
+
+    def write_packed(limit):
+        while packed_objects and (
+            len(packed_objects) > limit or packed_objects[0].done()
+        ):
+            data_buffer.write(packed_objects.popleft().result())
 
-        if use_mesh_modifiers:
-            depsgraph = bpy.context.evaluated_depsgraph_get()
+    print("Writing object data")
+    # Blender data may only be accessed from the main thread; the gathered
+    # arrays are packed in the background while the next object is realized
+    num_objects = 0
+    for obj in objects:
+        if depsgraph is not None:
             mesh_owner = obj.evaluated_get(depsgraph)
         else:
             mesh_owner = obj
 
-        try:
-            mesh = mesh_owner.to_mesh()
-        except RuntimeError:
-            return
+        # Meshes without modifiers can be read as they are, as long as they
+        # are not transformed in place by the fallback path
+        owns_mesh = depsgraph is not None or len(obj.modifiers) > 0 or numpy is None
+        if not owns_mesh:
+            mesh = obj.data
+        else:
+            try:
+                mesh = mesh_owner.to_mesh()
+            except RuntimeError:
+                mesh = None
 
         if mesh is None:
-            return
+            self.report(
+                {"WARNING"}, f"Object {obj.name} could not be converted, skipping"
+            )
+            continue
 
+        # Tangents can only be computed for tris and quads, so meshes with
+        # n-gons are triangulated first, on a copy of the original mesh
+        use_tangents = mesh.uv_layers.active is not None
+        if use_tangents and has_ngons(mesh):
+            if not owns_mesh:
+                mesh = mesh_owner.to_mesh()
+                owns_mesh = True
+            triangulate(mesh)
+
+        mat = global_matrix @ obj.matrix_world
+        if precision == "HALF" and exceeds_half_range(mesh_owner, mat):
+            self.report(
+                {"WARNING"},
+                f"Object {obj.name} exceeds the half precision range, clamping",
+            )
+        if numpy is None:
+            mesh.transform(mat)
+            if mat.is_negative:
+                mesh.flip_normals()
         mesh.calc_loop_triangles()
 
+        # Tangents can only be computed from a UV map
+        uv_layer = mesh.uv_layers.active
+        if use_tangents:
+            mesh.calc_tangents()
+        else:
+            self.report(
+                {"WARNING"}, f"Object {obj.name} has no UV map, writing empty UVs"
+            )
+
         num_tris = len(mesh.loop_triangles)
         if num_tris >= 2**16:
             self.report({"WARNING"}, f"Object {obj.name} has too many triangles!")
 
         # Write object metadata
         obj_name = obj.name.encode("utf-8")
-        buffer.write(struct.pack("<I", len(obj_name)))                                  ### <name-length>
-        buffer.write(obj_name)                                                          ### <name>
-        buffer.write(struct.pack("<H", num_tris))                                       ### <triangle-count>
+        metadata_buffer.write(_PACK_U32.pack(len(obj_name)))                            ### <name-length>
+        metadata_buffer.write(obj_name)                                                 ### <name>
+        metadata_buffer.write(_PACK_U16.pack(num_tris))                                 ### <triangle-count>
+
+        print(f"Writing object '{obj.name}' with {len(mesh.vertices)} vertices")
+
+        # Pack triangles
+        if numpy is not None:
+            arrays = gather_triangle_arrays(mesh, uv_layer)
+            packed = executor.submit(
+                pack_triangles, arrays, mat, use_indexed, precision
+            )
+        else:
+            packed = Future()
+            packed.set_result(
+                pack_triangles_struct(mesh, uv_layer, use_indexed, precision)
+            )
+        packed_objects.append(packed)
+        num_objects += 1
+        if owns_mesh:
+            mesh_owner.to_mesh_clear()
+        elif uv_layer is not None:
+            mesh.free_tangents()
 
-        mesh_owner.to_mesh_clear()
+        write_packed(max_packed_objects)
 
+    write_packed(0)
+    return num_objects
 
-def write_objects(self, buffer, objects, global_matrix, use_mesh_modifiers=False):
-    import struct
-    import bmesh
 
-    print("Writing object data")
-    for obj in objects:
+def move_data(file, start, end, offset):
+    # Move file contents towards the start, chunk by chunk
+    position = start
+    while position < end:
+        file.seek(position)
+        chunk = file.read(min(COPY_CHUNK_SIZE, end - position))
+        file.seek(position + offset)
+        file.write(chunk)
+        position += len(chunk)
+
+
+def write_sfmesh_raw(
+    self,
+    buffer,
+    objects,
+    global_matrix,
+    use_mesh_modifiers=False,
+    use_indexed=False,
+    precision="FULL",
+):
+    import io
+    import os
+    import shutil
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    print("Writing SFMesh...")
+    mesh_objects = [obj for obj in objects if obj.type == "MESH"]
+    for obj in mesh_objects:
         if obj.mode == "EDIT":
             obj.update_from_editmode()
 
-        if use_mesh_modifiers:
-            depsgraph = bpy.context.evaluated_depsgraph_get()
-            mesh_owner = obj.evaluated_get(depsgraph)
+    # Edit mode changes must be synced before the depsgraph is evaluated
+    depsgraph = bpy.context.evaluated_depsgraph_get() if use_mesh_modifiers else None
+
+    options = PRECISION_OPTIONS[precision]
+    if use_indexed:
+        options |= OPTION_INDEXED
+
+    # Each mesh is realized only once, but the header needs every triangle
+    # count before any data
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        if buffer.seekable():
+            # Reserve space for the header and metadata, stream the data
+            # straight into the file and patch the header afterwards
+            header_start = buffer.tell()
+            write_header(self, buffer, len(mesh_objects), options)
+            metadata_start = buffer.tell()
+            reserved_size = sum(
+                _PACK_U32.size + len(obj.name.encode("utf-8")) + _PACK_U16.size
+                for obj in mesh_objects
+            )
+            buffer.write(bytes(reserved_size))
+
+            with io.BytesIO() as metadata_buffer:
+                num_objects = write_objects(
+                    self,
+                    executor,
+                    metadata_buffer,
+                    buffer,
+                    mesh_objects,
+                    global_matrix,
+                    depsgraph,
+                    use_indexed,
+                    precision,
+                )
+                metadata = metadata_buffer.getvalue()
+
+            # Skipped objects leave a gap in the reserved metadata
+            data_start = metadata_start + reserved_size
+            data_end = buffer.tell()
+            gap = reserved_size - len(metadata)
+            if gap:
+                move_data(buffer, data_start, data_end, -gap)
+                buffer.truncate(data_end - gap)
+
+            buffer.seek(header_start + _PACK_HDR_VERSION.size + _PACK_U32.size)
+            buffer.write(_PACK_U32.pack(num_objects))                                   ## <num-objects>
+            buffer.write(metadata)
+            buffer.seek(0, io.SEEK_END)
         else:
-            mesh_owner = obj
+            # The metadata is collected in memory and the data is spooled to
+            # a temporary file, then both are written after the header
+            with (
+                io.BytesIO() as metadata_buffer,
+                tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as data_buffer,
+            ):
+                num_objects = write_objects(
+                    self,
+                    executor,
+                    metadata_buffer,
+                    data_buffer,
+                    mesh_objects,
+                    global_matrix,
+                    depsgraph,
+                    use_indexed,
+                    precision,
+                )
+                write_header(self, buffer, num_objects, options)
+                buffer.write(metadata_buffer.getbuffer())
+                data_buffer.seek(0)
+                shutil.copyfileobj(data_buffer, buffer, COPY_CHUNK_SIZE)
+    print("Done")
 
-        try:
-            mesh = mesh_owner.to_mesh()
-        except RuntimeError:
-            return
 
-        if mesh is None:
-            return
+class LZMAWriter:
+    """File-like sink that compresses everything written to it.
 
-        bm = bmesh.new()
-        bm.from_mesh(mesh)
-        bmesh.ops.triangulate(bm, faces=bm.faces)
-        bm.to_mesh(mesh)
-        bm.free
+    The compressed stream is patched for GLua compatibility once finished.
+    """
 
-        mat = global_matrix @ obj.matrix_world
-        mesh.transform(mat)
-        if mat.is_negative:
-            mesh.flip_normals()
-        mesh.calc_loop_triangles()
-        mesh.calc_tangents()
+    def __init__(self, dict_size=16 << 20):
+        import lzma
 
-        print(f"Writing object '{obj.name}' with {len(mesh.vertices)} vertices")
+        # Mesh data has little long-range redundancy, a moderate dictionary
+        # compresses nearly as well as preset 9 at a fraction of the memory
+        filters = [{"id": lzma.FILTER_LZMA1, "preset": 6, "dict_size": dict_size}]
+        self.compressor = lzma.LZMACompressor(
+            format=lzma.FORMAT_ALONE, filters=filters
+        )
+        self.out = bytearray()
+        self.uncompressed_size = 0
 
-        # Write triangles
-        for triangle in mesh.loop_triangles:
-            for loop_index in reversed(triangle.loops):
-                loop = mesh.loops[loop_index]
-                vertex_index = loop.vertex_index
-                vertex = mesh.vertices[vertex_index]
-                uv = mesh.uv_layers.active.data[loop_index].uv
-                buffer.write(
-                    struct.pack("<3f", vertex.co.x, vertex.co.y, vertex.co.z)
-                )                                                                       # <position>
-                buffer.write(
-                    struct.pack(
-                        "<3f", vertex.normal.x, vertex.normal.y, vertex.normal.z
-                    )
-                )                                                                       # <normal>
-                buffer.write(struct.pack("<2f", uv.x, uv.y))                            # <uv>
-                buffer.write(
-                    struct.pack(
-                        "<3f", loop.tangent[0], loop.tangent[1], loop.tangent[2]
-                    )
-                )                                                                       # <tangent>
-        mesh_owner.to_mesh_clear()
-
-
-def write_sfmesh_raw(self, buffer, objects, global_matrix, use_mesh_modifiers=False):
-    import struct
+    def seekable(self):
+        return False
 
-    print("Writing SFMesh...")
-    write_header(self, buffer, objects, use_mesh_modifiers)
-    write_objects(self, buffer, objects, global_matrix, use_mesh_modifiers)
-    print("Done")
+    def write(self, data):
+        self.uncompressed_size += len(data)
+        self.out += self.compressor.compress(data)
+
+    def finish(self):
+        self.out += self.compressor.flush()
+
+        # LZMA shenanigans for GLua compatibility...
+        self.out[5:13] = self.uncompressed_size.to_bytes(8, "little")
+        return self.out
 
 
 def write_sfmesh(
@@ -143,34 +668,63 @@ def write_sfmesh(
     global_matrix,
     use_mesh_modifiers=False,
     write_raw_file=False,
+    compress_dict_mb=16.0,
+    use_indexed=False,
+    precision="FULL",
 ):
-    import io
-    import lzma
-    import base64
-
-    with io.BytesIO() as buffer:
-        write_sfmesh_raw(self, buffer, objects, global_matrix, use_mesh_modifiers)
-
-        if write_raw_file:
-            with open(filepath, "wb") as file:
-                file.write(buffer.getvalue())
-        else:
-            buffer_value = buffer.getvalue()
-
-            # LZMA shenanigans for GLua compatibility...
-            uncompressed_size = len(buffer_value)
-            lzc_string = lzma.compress(buffer_value, format=lzma.FORMAT_ALONE, preset=9)
-            lzc_string = (
-                lzc_string[:5]
-                + uncompressed_size.to_bytes(8, "little")
-                + lzc_string[13:]
-            )
+    import contextlib
+    import os
+
+    try:
+        import pybase64 as base64
+    except ImportError:
+        import base64
+
+    if write_raw_file:
+        # Nothing to post-process, so the data is streamed straight to disk and
+        # the header patched in place. A temporary file is used so a failed
+        # export doesn't destroy an existing file
+        temp_filepath = filepath + ".tmp"
+        file = open(temp_filepath, "w+b", buffering=1 << 20)
+        try:
+            with file:
+                write_sfmesh_raw(
+                    self,
+                    file,
+                    objects,
+                    global_matrix,
+                    use_mesh_modifiers,
+                    use_indexed,
+                    precision,
+                )
+            os.replace(temp_filepath, filepath)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_filepath)
+            raise
+    else:
+        buffer = LZMAWriter(dict_size=int(compress_dict_mb * (1 << 20)))
+        write_sfmesh_raw(
+            self,
+            buffer,
+            objects,
+            global_matrix,
+            use_mesh_modifiers,
+            use_indexed,
+            precision,
+        )
+        lzc_string = buffer.finish()
 
-            b64_string = base64.b64encode(lzc_string)
-            with open(filepath, "wb") as file:
-                file.write(b'return "')
-                file.write(b64_string)
-                file.write(b'"')
+        # Encode in chunks to avoid holding the whole Base64 string in memory.
+        # The chunk size must be a multiple of 3 so no padding is emitted mid-stream
+        chunk_size = 3 << 20
+        lzc_view = memoryview(lzc_string)
+        with open(filepath, "wb") as file:
+            file.write(b'return "')
+            for offset in range(0, len(lzc_view), chunk_size):
+                file.write(base64.b64encode(lzc_view[offset : offset + chunk_size]))
+            file.write(b'"')
+        lzc_view.release()
 
 
 @orientation_helper(axis_forward="Y", axis_up="Z")
@@ -210,6 +764,21 @@ class ExportSFMesh(Operator, ExportHelper):
         default=True,
     )
 
+    use_indexed: BoolProperty(
+        name="Indexed Vertices",
+        description="Write each unique vertex once and reference it by index",
+        default=False,
+    )
+
+    precision: EnumProperty(
+        name="Precision",
+        items=(
+            ("FULL", "Full", "Store vertex data as 32-bit floats"),
+            ("HALF", "Half", "Store vertex data as 16-bit floats"),
+            ("QUANTIZED", "Quantized", "Store vertex data as 16 and 8-bit integers"),
+        ),
+    )
+
     batch_mode: EnumProperty(
         name="Batch Mode",
         items=(
@@ -224,6 +793,14 @@ class ExportSFMesh(Operator, ExportHelper):
         default=False,
     )
 
+    compress_dict_mb: FloatProperty(
+        name="Dictionary Size (MiB)",
+        description="LZMA dictionary size, larger values use more memory while exporting",
+        min=1.0,
+        max=1024.0,
+        default=16.0,
+    )
+
     @property
     def check_extension(self):
         return self.batch_mode == "OFF"
@@ -269,6 +846,9 @@ class ExportSFMesh(Operator, ExportHelper):
                 global_matrix=global_matrix,
                 use_mesh_modifiers=self.use_mesh_modifiers,
                 write_raw_file=self.write_raw_file,
+                compress_dict_mb=self.compress_dict_mb,
+                use_indexed=self.use_indexed,
+                precision=self.precision,
             )
         elif self.batch_mode == "OBJECT":
             prefix = os.path.splitext(self.filepath)[0]
@@ -281,6 +861,9 @@ class ExportSFMesh(Operator, ExportHelper):
                     global_matrix=global_matrix,
                     use_mesh_modifiers=self.use_mesh_modifiers,
                     write_raw_file=self.write_raw_file,
+                    compress_dict_mb=self.compress_dict_mb,
+                    use_indexed=self.use_indexed,
+                    precision=self.precision,
                 )
 
         return {"FINISHED"}
@@ -304,8 +887,11 @@ class ExportSFMesh(Operator, ExportHelper):
         layout.prop(operator, "axis_up")
 
         layout.prop(operator, "use_mesh_modifiers")
+        layout.prop(operator, "use_indexed")
+        layout.prop(operator, "precision")
 
         layout.prop(operator, "write_raw_file")
+        layout.prop(operator, "compress_dict_mb")
 
 
 class SFMESH_PT_export_main(bpy.types.Panel):
@@ -403,6 +989,8 @@ class SFMESH_PT_export_geometry(bpy.types.Panel):
         operator = sfile.active_operator
 
         layout.prop(operator, "use_mesh_modifiers")
+        layout.prop(operator, "use_indexed")
+        layout.prop(operator, "precision")
 
 
 def menu_export(self, context):